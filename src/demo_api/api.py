@@ -1,66 +1,98 @@
+import functools
+import logging
 import traceback
 
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+import orjson
 import structlog
 
 from . import crypto, models
-from .utils import b64_encode, b64_decode
+from .utils import b64_decode, encode_b64_and_hex
 
-log = structlog.get_logger(
+# orjson renders straight to bytes, so log through a bytes logger.
+structlog.configure(
     processors=[
-        structlog.processors.JSONRenderer(indent=2),
+        structlog.processors.JSONRenderer(serializer=orjson.dumps),
     ],
+    wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
+    logger_factory=structlog.BytesLoggerFactory(),
+    cache_logger_on_first_use=True,
 )
+
+log = structlog.get_logger()
 log.info("logger initialized")
 
+
+class _Hex:
+    """Bytes that are only hex encoded if the log event is rendered."""
+
+    __slots__ = ("data", "sep")
+
+    def __init__(self, data: bytes | memoryview, sep: str = "") -> None:
+        self.data = data
+        self.sep = sep
+
+    def __str__(self) -> str:
+        return self.data.hex(self.sep) if self.sep else self.data.hex()
+
+    # Called by structlog's JSONRenderer for values it can't serialize.
+    __structlog__ = __str__
+
+
 # Create the FastAPI app
 app = FastAPI(title="Padding Oracle Demo API")
 
-# Create the router for API endpoints
-router = APIRouter()
-
-
-def encrypt(plaintext: str) -> bytes:
-    plaintext = plaintext.encode("utf-8")
-    cipher = crypto.CipherSuite.AES_128_CBC.value
-    key = crypto.get_key(cipher)
-    iv = crypto.get_iv(cipher, random=False)
-
-    ciphertext = crypto.encrypt(cipher, key, iv, plaintext)
-    log.info(
-        "encrypted",
-        cipher=cipher,
-        plaintext=plaintext,
-        plaintext_hex=plaintext.hex(" "),
-        key_hex=key.hex(),
-        iv_hex=iv.hex(),
-        ciphertext_hex=ciphertext.hex(" "),
-        key_len=len(key),
-        iv_len=len(iv),
-        ciphertext_len=len(ciphertext),
-    )
+# The demo only uses one cipher, key and static IV, so resolve them once.
+_CIPHER = crypto.CipherSuite.AES_128_CBC.value
+_KEY = crypto.get_key(_CIPHER)
+_IV_STATIC = crypto.get_iv(_CIPHER, random=False)
+
+# /validate only ever succeeds with the same body, so serialize it once.
+_VALID_RESPONSE_BODY = orjson.dumps(models.ValidateResponse(valid=True).model_dump())
+
+
+def encrypt(plaintext: str | bytes) -> bytes:
+    if isinstance(plaintext, str):
+        plaintext = plaintext.encode("utf-8")
+    ciphertext = crypto.encrypt(_CIPHER, _KEY, _IV_STATIC, plaintext)
+    if log.is_enabled_for(logging.INFO):
+        log.info(
+            "encrypted",
+            cipher=_CIPHER,
+            plaintext=plaintext,
+            plaintext_hex=_Hex(plaintext, " "),
+            key_hex=_Hex(_KEY),
+            iv_hex=_Hex(_IV_STATIC),
+            ciphertext_hex=_Hex(ciphertext, " "),
+            key_len=len(_KEY),
+            iv_len=len(_IV_STATIC),
+            ciphertext_len=len(ciphertext),
+        )
     return ciphertext
 
 
+@functools.cache
 def build_encrypted_response(plaintext: str) -> models.EncryptResponse:
-    """Build a response with the encrypted ciphertext of the given plaintext."""
-    ct = encrypt(plaintext)
+    """Build a response with the encrypted ciphertext of the given plaintext.
+    The key and IV are static, so each demo plaintext is only encrypted once.
+    """
+    ciphertext_b64, ciphertext_hex = encode_b64_and_hex(encrypt(plaintext))
     return models.EncryptResponse(
-        alg=crypto.CipherSuite.AES_128_CBC.value,
-        ciphertext_b64=b64_encode(ct),
-        ciphertext_hex=ct.hex(),
+        alg=_CIPHER,
+        ciphertext_b64=ciphertext_b64,
+        ciphertext_hex=ciphertext_hex,
     )
 
 
-@router.get("/demo1", response_model=models.EncryptResponse)
-def demo1():
+@app.get("/api/demo1", response_model=models.EncryptResponse)
+async def demo1():
     """Single block with static IV and ciphertext."""
     plaintext = "Hello, world!"
     return build_encrypted_response(plaintext=plaintext)
 
 
-@router.get("/demo2", response_model=models.EncryptResponse)
-def demo2():
+@app.get("/api/demo2", response_model=models.EncryptResponse)
+async def demo2():
     """Base64 encoded ciphertext with 5 blocks and a static IV.
     Each plaintext block is 16 bytes of the same character.
     """
@@ -74,8 +106,8 @@ def demo2():
     return build_encrypted_response(plaintext=plaintext)
 
 
-@router.get("/demo3", response_model=models.EncryptResponse)
-def demo3():
+@app.get("/api/demo3", response_model=models.EncryptResponse)
+async def demo3():
     """Longer Base64 encoded ciphertext with a static IV."""
     plaintext = """Bad stuff happens in the bathroom
 I'm just glad that it happens in a vacuum
@@ -97,73 +129,91 @@ If Teddy can't unstick my dad, I'll find another way"""
     return build_encrypted_response(plaintext=plaintext)
 
 
-@router.post("/encrypt", response_model=models.EncryptResponse)
-def encrypt_api(req: models.EncryptRequest):
+@app.post("/api/encrypt", response_model=models.EncryptResponse)
+async def encrypt_api(req: models.EncryptRequest):
     """Encrypt the given plaintext and return the ciphertext."""
     try:
         plaintext = b64_decode(req.plaintext_b64)
-        ciphertext = encrypt(plaintext)
-        cipher = crypto.CipherSuite.AES_128_CBC.value
+        ciphertext_b64, ciphertext_hex = encode_b64_and_hex(encrypt(plaintext))
         return models.EncryptResponse(
-            alg=cipher,
-            ciphertext_b64=b64_encode(ciphertext),
-            ciphertext_hex=ciphertext.hex(),
+            alg=_CIPHER,
+            ciphertext_b64=ciphertext_b64,
+            ciphertext_hex=ciphertext_hex,
         )
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=f"Encryption error: {e}")
 
 
-@router.post("/validate", response_model=models.ValidateResponse)
-def validate(req: models.ValidateRequest):
+@app.post("/api/validate", response_model=models.ValidateResponse)
+async def validate(req: models.ValidateRequest):
     """Validate the given ciphertext and return the plaintext.
     This is the endpoint that is vulnerable to the padding oracle attack.
     """
-    cipher = crypto.CipherSuite.AES_128_CBC.value
-    key = crypto.get_key(cipher)
-
-    ciphertext_b64 = req.ciphertext_b64
-    ciphertext = b64_decode(ciphertext_b64)
+    try:
+        ciphertext = b64_decode(req.ciphertext_b64)
+    except ValueError as e:  # binascii.Error is a ValueError.
+        raise HTTPException(status_code=400, detail=f"Invalid base64: {e}")
 
     if len(ciphertext) < 32:
         raise HTTPException(
             status_code=400, detail="Ciphertext must be at least 32 bytes long"
         )
 
-    ciphertext_n = ciphertext[-16:]
-    ciphertext_n_1 = ciphertext[-32:-16]
-
     try:
-        log.info(
-            "decrypting",
-            cipher=cipher,
-            key_hex=key.hex(),
-            ciphertext_hex=ciphertext.hex(),
-            key_len=len(key),
-            ciphertext_len=len(ciphertext),
-        )
+        log_info = log.is_enabled_for(logging.INFO)
+        if log_info:
+            log.info(
+                "decrypting",
+                cipher=_CIPHER,
+                key_hex=_Hex(_KEY),
+                ciphertext_hex=_Hex(ciphertext),
+                key_len=len(_KEY),
+                ciphertext_len=len(ciphertext),
+            )
 
-        plaintext = crypto.decrypt(cipher, key, ciphertext)
-        log.info(
-            "decrypted",
-            plaintext=plaintext,
-            plaintext_hex=plaintext.hex(),
-        )
+        plaintext = crypto.decrypt(_CIPHER, _KEY, ciphertext)
+        if log_info:
+            log.info(
+                "decrypted",
+                plaintext=plaintext,
+                plaintext_hex=_Hex(plaintext),
+            )
 
-        return models.ValidateResponse(
-            valid=True,
+        return Response(content=_VALID_RESPONSE_BODY, media_type="application/json")
+    except crypto.InvalidPaddingError as e:
+        # Zero-copy views of the last two blocks; only hexed if logged.
+        view = memoryview(ciphertext)
+        log.warning(
+            "invalid padding bytes",
+            ciphertext_n=_Hex(view[-16:]),
+            ciphertext_n_1=_Hex(view[-32:-16]),
         )
+        raise HTTPException(status_code=400, detail=f"{e}")
     except Exception as e:
-        if "Invalid padding bytes" in str(e):
-            log.warn(
-                "invalid padding bytes",
-                ciphertext_n=ciphertext_n.hex(),
-                ciphertext_n_1=ciphertext_n_1.hex(),
-            )
-        else:
+        log.warning("validation failed", error=str(e))
+        if log.is_enabled_for(logging.DEBUG):
             traceback.print_exc()
         raise HTTPException(status_code=400, detail=f"{e}")
 
 
-# Include the router in the app (after all routes are defined)
-app.include_router(router, prefix="/api")
+@app.post("/api/validate_batch", response_model=models.ValidateBatchResponse)
+async def validate_batch(req: models.ValidateBatchRequest):
+    """Validate up to 256 ciphertexts in one request, one padding answer each.
+    Lets a client pay one round trip for a whole batch of guesses.
+    """
+    valid = []
+    for ciphertext_b64 in req.ciphertexts_b64:
+        try:
+            ciphertext = b64_decode(ciphertext_b64)
+            if len(ciphertext) < 32:
+                raise ValueError("Ciphertext must be at least 32 bytes long")
+            crypto.decrypt(_CIPHER, _KEY, ciphertext)
+            valid.append(True)
+        except ValueError:  # Includes bad padding and bad base64.
+            valid.append(False)
+
+    log.info("validated batch", batch_len=len(valid), valid_count=sum(valid))
+    return Response(
+        content=orjson.dumps({"valid": valid}), media_type="application/json"
+    )
@@ -1,9 +1,16 @@
+import functools
 import os
 import pathlib
+import tempfile
+from dataclasses import dataclass
 from enum import Enum
 
-from cryptography.hazmat.primitives import padding
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers import (
+    Cipher,
+    CipherAlgorithm,
+    algorithms,
+    modes,
+)
 import structlog
 
 
@@ -27,77 +34,114 @@ class CipherSuite(str, Enum):
         return self.value
 
 
+class InvalidPaddingError(ValueError):
+    """Raised by decrypt() when the plaintext has bad PKCS7 padding."""
+
+
+@dataclass(frozen=True, slots=True)
+class AlgSpec:
+    """Sizes (in bytes) and construction details for a cipher suite."""
+
+    key_len: int
+    block_len: int
+    alg_name: str  # Name of the cipher class in cryptography's `algorithms`.
+    is_cbc: bool
+
+
+_ALG_SPECS: dict[str, AlgSpec] = {
+    CipherSuite.AES_128_CBC.value: AlgSpec(16, 16, "AES", True),
+    CipherSuite.AES_128_ECB.value: AlgSpec(16, 16, "AES", False),
+    CipherSuite.AES_256_CBC.value: AlgSpec(32, 16, "AES", True),
+    CipherSuite.AES_256_ECB.value: AlgSpec(32, 16, "AES", False),
+    CipherSuite.DES_CBC.value: AlgSpec(8, 8, "DES", True),
+    CipherSuite.DES_ECB.value: AlgSpec(8, 8, "DES", False),
+    CipherSuite.DES3_CBC.value: AlgSpec(24, 8, "TripleDES", True),
+    CipherSuite.DES3_ECB.value: AlgSpec(24, 8, "TripleDES", False),
+}
+
+
+def _get_spec(algorithm: CipherSuite) -> AlgSpec:
+    """Returns the spec for the given algorithm."""
+    try:
+        return _ALG_SPECS[str(algorithm)]
+    except KeyError:
+        raise ValueError(f"Invalid algorithm: {algorithm}") from None
+
+
+def _read_or_create(path: pathlib.Path, new_value: bytes) -> bytes:
+    """Returns the bytes saved at path, saving new_value there first if missing.
+    The file is published atomically, so concurrent processes (e.g. server
+    workers) that race to create it all end up with the same bytes.
+    """
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        pass
+
+    # Write a private temp file, then hard-link it into place. The link fails
+    # if another process got there first, and never exposes a partial file.
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(new_value)
+        try:
+            os.link(tmp_name, path)
+        except FileExistsError:
+            return path.read_bytes()
+        return new_value
+    finally:
+        os.unlink(tmp_name)
+
+
+@functools.cache
 def get_key(algorithm: CipherSuite) -> bytes:
     """Returns a key for the given algorithm.
-    If the key file does not exist, it creates a new key and saves it to the key file."""
+    If the key file does not exist, it creates a new key and saves it to the key file.
+    The key is cached in memory (per process) after the first call."""
     keyfile = KEY_DIR / f"{algorithm}.key"
-    key = None
-    if not os.path.exists(keyfile):
-        match algorithm:
-            case CipherSuite.AES_128_CBC.value:
-                key = os.urandom(16)
-            case CipherSuite.AES_128_ECB.value:
-                key = os.urandom(16)
-            case CipherSuite.AES_256_CBC.value:
-                key = os.urandom(32)
-            case CipherSuite.AES_256_ECB.value:
-                key = os.urandom(32)
-            case CipherSuite.DES_CBC.value:
-                key = os.urandom(8)
-            case CipherSuite.DES_ECB.value:
-                key = os.urandom(8)
-            case CipherSuite.DES3_CBC.value:
-                key = os.urandom(24)
-            case CipherSuite.DES3_ECB.value:
-                key = os.urandom(24)
-            case _:
-                raise ValueError(f"Invalid algorithm: {algorithm}")
-        with open(keyfile, "wb") as f:
-            f.write(key)
-    else:
-        with open(keyfile, "rb") as f:
-            key = f.read()
-    return key
+    return _read_or_create(keyfile, os.urandom(_get_spec(algorithm).key_len))
 
 
-def get_iv(algorithm: CipherSuite, random: bool = True) -> bytes:
-    """Returns a random IV for the given algorithm.
-    If the IV file does not exist, it creates a new IV and saves it to the IV file."""
+def _new_iv(algorithm: CipherSuite) -> bytes:
+    """Returns a new random IV for the given algorithm."""
+    return os.urandom(_get_spec(algorithm).block_len)
+
+
+@functools.cache
+def _get_static_iv(algorithm: CipherSuite) -> bytes:
+    """Returns the IV saved in the IV file, creating it if it does not exist.
+    The IV is cached in memory (per process) after the first call."""
     ivfile = KEY_DIR / f"{algorithm}.iv"
-    iv = None
-
-    if random or not os.path.exists(ivfile):
-        match algorithm:
-            case CipherSuite.AES_128_CBC.value:
-                iv = os.urandom(16)
-            case CipherSuite.AES_128_ECB.value:
-                iv = os.urandom(16)
-            case CipherSuite.AES_256_CBC.value:
-                iv = os.urandom(16)
-            case CipherSuite.AES_256_ECB.value:
-                iv = os.urandom(16)
-            case CipherSuite.DES_CBC.value:
-                iv = os.urandom(8)
-            case CipherSuite.DES_ECB.value:
-                iv = os.urandom(8)
-            case CipherSuite.DES3_CBC.value:
-                iv = os.urandom(8)
-            case CipherSuite.DES3_ECB.value:
-                iv = os.urandom(8)
-            case _:
-                raise ValueError(f"Invalid algorithm: {algorithm}")
+    return _read_or_create(ivfile, _new_iv(algorithm))
 
+
+def get_iv(algorithm: CipherSuite, random: bool = True) -> bytes:
+    """Returns a random IV for the given algorithm.
+    If random is False, returns the static IV from the IV file instead,
+    creating it if it does not exist."""
     if random:
-        return iv
+        return _new_iv(algorithm)
+    return _get_static_iv(algorithm)
 
-    if not os.path.exists(ivfile):
-        with open(ivfile, "wb") as f:
-            f.write(iv)
-        return iv
 
-    with open(ivfile, "rb") as f:
-        iv = f.read()
-    return iv
+# PKCS7 padding strings by pad length, e.g. _PKCS7_PAD[3] == b"\x03\x03\x03".
+_PKCS7_PAD = tuple(bytes([n]) * n for n in range(17))
+
+# The same pads as big-endian integers, with masks selecting the last n bytes.
+_PKCS7_PAD_INT = tuple(int.from_bytes(pad, "big") for pad in _PKCS7_PAD)
+_PKCS7_PAD_MASK = tuple((1 << (8 * n)) - 1 for n in range(17))
+
+
+@functools.lru_cache(maxsize=8)
+def _cipher_algorithm(alg_name: str, key: bytes) -> CipherAlgorithm:
+    """Returns a cached cipher algorithm instance, so the key is only validated once."""
+    return getattr(algorithms, alg_name)(key)
+
+
+def _build_cipher(spec: AlgSpec, key: bytes, iv: bytes | None) -> Cipher:
+    """Returns a cipher for the given algorithm spec, key, and IV."""
+    mode = modes.CBC(iv) if spec.is_cbc else modes.ECB()
+    return Cipher(_cipher_algorithm(spec.alg_name, key), mode)
 
 
 def encrypt(algorithm: CipherSuite, key: bytes, iv: bytes, plaintext: bytes) -> bytes:
@@ -106,42 +150,14 @@ def encrypt(algorithm: CipherSuite, key: bytes, iv: bytes, plaintext: bytes) ->
     If the algorithm is ECB, it does not use an IV.
     """
 
-    padder_128 = padding.PKCS7(128).padder()
-    padder_64 = padding.PKCS7(64).padder()
-
     try:
-        match algorithm:
-            case CipherSuite.AES_128_CBC.value:
-                padder = padder_128
-                cipher = Cipher(algorithms.AES(key), modes.CBC(iv))
-            case CipherSuite.AES_128_ECB.value:
-                padder = padder_128
-                cipher = Cipher(algorithms.AES(key), modes.ECB())
-            case CipherSuite.AES_256_CBC.value:
-                padder = padder_128
-                cipher = Cipher(algorithms.AES(key), modes.CBC(iv))
-            case CipherSuite.AES_256_ECB.value:
-                padder = padder_128
-                cipher = Cipher(algorithms.AES(key), modes.ECB())
-            case CipherSuite.DES_CBC.value:
-                padder = padder_64
-                cipher = Cipher(algorithms.DES(key), modes.CBC(iv))
-            case CipherSuite.DES_ECB.value:
-                padder = padder_64
-                cipher = Cipher(algorithms.DES(key), modes.ECB())
-            case CipherSuite.DES3_CBC.value:
-                padder = padder_64
-                cipher = Cipher(algorithms.TripleDES(key), modes.CBC(iv))
-            case CipherSuite.DES3_ECB.value:
-                padder = padder_64
-                cipher = Cipher(algorithms.TripleDES(key), modes.ECB())
-            case _:
-                raise ValueError(f"Invalid algorithm: {algorithm}")
+        spec = _get_spec(algorithm)
+        cipher = _build_cipher(spec, key, iv)
     except Exception as e:
         log.error("encryption failed", error=e)
         raise e
 
-    padded = padder.update(plaintext) + padder.finalize()
+    padded = plaintext + _PKCS7_PAD[spec.block_len - len(plaintext) % spec.block_len]
     encryptor = cipher.encryptor()
 
     # Prepend the IV to the ciphertext.
@@ -156,39 +172,25 @@ def decrypt(algorithm: CipherSuite, key: bytes, ciphertext: bytes) -> bytes:
     """
 
     try:
-        match algorithm:
-            case CipherSuite.AES_128_CBC.value:
-                iv = ciphertext[:16]
-                cipher = Cipher(algorithms.AES(key), modes.CBC(iv))
-            case CipherSuite.AES_128_ECB.value:
-                iv = None
-                cipher = Cipher(algorithms.AES(key), modes.ECB())
-            case CipherSuite.AES_256_CBC.value:
-                iv = ciphertext[:16]
-                cipher = Cipher(algorithms.AES(key), modes.CBC(iv))
-            case CipherSuite.AES_256_ECB.value:
-                iv = None
-                cipher = Cipher(algorithms.AES(key), modes.ECB())
-            case CipherSuite.DES_CBC.value:
-                iv = ciphertext[:8]
-                cipher = Cipher(algorithms.DES(key), modes.CBC(iv))
-            case CipherSuite.DES_ECB.value:
-                iv = None
-                cipher = Cipher(algorithms.DES(key), modes.ECB())
-            case CipherSuite.DES3_CBC.value:
-                iv = ciphertext[:8]
-                cipher = Cipher(algorithms.TripleDES(key), modes.CBC(iv))
-            case CipherSuite.DES3_ECB.value:
-                iv = None
-                cipher = Cipher(algorithms.TripleDES(key), modes.ECB())
-            case _:
-                raise ValueError(f"Invalid algorithm: {algorithm}")
+        spec = _get_spec(algorithm)
+        iv = ciphertext[: spec.block_len] if spec.is_cbc else None
+        cipher = _build_cipher(spec, key, iv)
     except Exception as e:
         log.error("decryption failed", error=e)
         raise e
 
     decryptor = cipher.decryptor()
-    padded = decryptor.update(ciphertext[16:]) + decryptor.finalize()
-    unpadder = padding.PKCS7(128).unpadder()
-    unpadded = unpadder.update(padded) + unpadder.finalize()
-    return unpadded
+    block_len = spec.block_len
+    padded = decryptor.update(ciphertext[block_len:]) + decryptor.finalize()
+
+    # PKCS7 unpad, checking the whole pad with one integer compare over the
+    # last block. The error message is what the padding oracle looks for.
+    tail = int.from_bytes(padded[-block_len:], "big")
+    pad_len = tail & 0xFF
+    if (
+        pad_len == 0
+        or pad_len > block_len
+        or tail & _PKCS7_PAD_MASK[pad_len] != _PKCS7_PAD_INT[pad_len]
+    ):
+        raise InvalidPaddingError("Invalid padding bytes")
+    return padded[:-pad_len]
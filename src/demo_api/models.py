@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from . import crypto
 
@@ -15,8 +15,17 @@ class EncryptResponse(BaseModel):
 
 class ValidateRequest(BaseModel):
     alg: crypto.CipherSuite
-    ciphertext_b64: bytes
+    ciphertext_b64: str
 
 
 class ValidateResponse(BaseModel):
     valid: bool
+
+
+class ValidateBatchRequest(BaseModel):
+    alg: crypto.CipherSuite
+    ciphertexts_b64: list[str] = Field(max_length=256)
+
+
+class ValidateBatchResponse(BaseModel):
+    valid: list[bool]
@@ -1,6 +1,9 @@
-import base64
 from typing import Union
 
+import pybase64
+
+_URLSAFE_TO_STANDARD = bytes.maketrans(b"-_", b"+/")
+
 
 def _as_bytes(
     data: Union[str, bytes, bytearray, memoryview],
@@ -16,34 +19,27 @@ def _as_bytes(
         return data.encode(encoding)
 
 
-def b64_encode(
-    data: Union[str, bytes, bytearray, memoryview],
-    *,
-    urlsafe: bool = False,
-    text_encoding: str = "utf-8",
-) -> str:
-    """Accepts str/bytes/...; returns a base64 string (standard or URL-safe)."""
-    raw = _as_bytes(data, encoding=text_encoding)
-    fn = base64.urlsafe_b64encode if urlsafe else base64.b64encode
-    return fn(raw).decode("ascii")
+def encode_b64_and_hex(data: bytes) -> tuple[str, str]:
+    """Returns the standard base64 and hex encodings of a bytes buffer."""
+    return pybase64.b64encode_as_string(data), data.hex()
 
 
 def b64_decode(
-    b64_text: str,
+    b64_text: Union[str, bytes],
     *,
     return_str: bool = False,
     text_encoding: str = "utf-8",
 ) -> Union[bytes, str]:
     """Decodes either standard or URL-safe b64. Tolerates missing '=' padding."""
+    # Map the URL-safe alphabet onto the standard one so both decode in one pass.
+    raw = _as_bytes(b64_text, encoding="ascii").translate(_URLSAFE_TO_STANDARD)
+
     # normalize padding
-    missing = len(b64_text) % 4
+    missing = -len(raw) & 3
     if missing:
-        b64_text += "=" * (4 - missing)
+        raw += b"=" * missing
 
-    try:
-        out = base64.b64decode(b64_text, validate=True)  # standard
-    except Exception:
-        out = base64.urlsafe_b64decode(b64_text)  # url-safe fallback
+    out = pybase64.b64decode(raw, validate=True)
 
     if return_str:
         return out.decode(text_encoding)  # may raise UnicodeDecodeError if not text
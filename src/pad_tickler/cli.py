@@ -1,20 +1,21 @@
+import functools
 from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 import click
-import requests
 
-from pad_tickler.demo_guess import submit_guess as demo_submit_guess
 from pad_tickler.state_queue import SingleSlotQueue
 from pad_tickler.state_snapshot import StateSnapshot
-from pad_tickler.solver import solve_message
-from pad_tickler.ui import ui_loop
+from pad_tickler.solver import BATCH_GUESSES, solve_message
 from pad_tickler.utils import (
     b64_decode,
     load_ciphertext,
-    load_guess_fn,
-    bytestring_from_list_of_blocks,
+    load_guess_fns,
+    PLUGIN_BATCH_FUNC_NAME,
+    rate_limit_guess_fn,
     strip_plaintext_padding,
     CiphertextFormat,
+    SubmitGuessBatchFn,
     SubmitGuessFn,
 )
 
@@ -24,12 +25,36 @@ def cli():
     pass
 
 
-def solver(submit_guess: SubmitGuessFn, ciphertext: bytes):
+def solver(
+    submit_guess: SubmitGuessFn,
+    ciphertext: bytes,
+    workers: int = 1,
+    rate_limit: float = 0,
+    block_workers: int = 1,
+    ascii_bias: bool = False,
+    submit_guess_batch: Optional[SubmitGuessBatchFn] = None,
+):
     """Run the real padding oracle solver against a remote service."""
+    from pad_tickler.ui import ui_loop  # rich is slow to import; only load to run.
+
+    if rate_limit > 0:
+        if submit_guess_batch is not None:
+            # The rate limit counts single guesses, so it rules out batching.
+            raise ValueError("submit_guess_batch cannot be combined with rate_limit")
+        submit_guess = rate_limit_guess_fn(submit_guess, rate_limit, burst=workers)
     state_queue: SingleSlotQueue[StateSnapshot] = SingleSlotQueue()
 
     with ThreadPoolExecutor() as executor:
-        future = executor.submit(solve_message, submit_guess, state_queue, ciphertext)
+        future = executor.submit(
+            solve_message,
+            submit_guess,
+            state_queue,
+            ciphertext,
+            workers=workers,
+            block_workers=block_workers,
+            ascii_bias=ascii_bias,
+            submit_batch=submit_guess_batch,
+        )
 
         try:
             ui_loop(state_queue)
@@ -37,14 +62,16 @@ def solver(submit_guess: SubmitGuessFn, ciphertext: bytes):
             state_queue.close()
 
         plaintext = future.result()
-        plaintext = bytestring_from_list_of_blocks(plaintext)
         plaintext = strip_plaintext_padding(plaintext)
         return plaintext
 
 
 def fetch_demo_data(endpoint: str) -> bytes:
     """Fetch the demo data from the given test endpoint."""
-    response = requests.get(endpoint)
+    from pad_tickler.demo_guess import SESSION as demo_session
+
+    # Share the demo guess session so the first guesses reuse this connection.
+    response = demo_session.get(endpoint, timeout=10)
     if response.status_code != 200:
         raise ValueError(
             f"Failed to get {endpoint}: {response.status_code} {response.text}"
@@ -53,29 +80,98 @@ def fetch_demo_data(endpoint: str) -> bytes:
     return b64_decode(data["ciphertext_b64"])
 
 
+def solver_options(batch_help: str):
+    """Click options shared by the commands that run the solver."""
+    options = [
+        click.option(
+            "--workers",
+            "-w",
+            default=1,
+            type=click.IntRange(min=1),
+            help="Guesses to submit concurrently (the guess function must be thread-safe)",
+        ),
+        click.option(
+            "--rate-limit", default=0.0, help="Max guesses per second (0 for no limit)"
+        ),
+        click.option(
+            "--block-workers",
+            "-b",
+            default=1,
+            type=click.IntRange(min=1),
+            help="Blocks to solve concurrently (the guess function must be thread-safe)",
+        ),
+        click.option(
+            "--ascii-bias", is_flag=True, help="Guess common English text bytes first"
+        ),
+        click.option("--batch", is_flag=True, help=batch_help),
+    ]
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def command(**kwargs):
+            # Reject the conflict before the command fetches or loads anything.
+            if kwargs["batch"] and kwargs["rate_limit"] > 0:
+                raise click.UsageError("--batch cannot be combined with --rate-limit")
+            return fn(**kwargs)
+
+        # Apply bottom-up so --help lists the options in the order above.
+        for option in reversed(options):
+            command = option(command)
+        return command
+
+    return decorator
+
+
+DEMO_BATCH_HELP = (
+    f"Send {BATCH_GUESSES} guesses per request to /api/validate_batch "
+    "(replaces --workers)"
+)
+
+
+def _run_demo(
+    endpoint_path: str,
+    *,
+    workers: int,
+    rate_limit: float,
+    block_workers: int,
+    ascii_bias: bool,
+    batch: bool,
+) -> None:
+    """Solve the ciphertext served by a demo API endpoint and print the plaintext."""
+    from pad_tickler import demo_guess  # Defer importing requests.
+
+    ciphertext = fetch_demo_data(f"http://127.0.0.1:8000{endpoint_path}")
+    plaintext = solver(
+        demo_guess.submit_guess,
+        ciphertext,
+        workers,
+        rate_limit,
+        block_workers,
+        ascii_bias,
+        demo_guess.submit_guess_batch if batch else None,
+    )
+    print(plaintext)
+
+
 @cli.command()
-def demo1():
+@solver_options(DEMO_BATCH_HELP)
+def demo1(**opts):
     """Run with data from the demo1 endpoint."""
-    ciphertext = fetch_demo_data("http://127.0.0.1:8000/api/demo1")
-    plaintext = solver(demo_submit_guess, ciphertext)
-    print(plaintext)
-    # breakpoint()
+    _run_demo("/api/demo1", **opts)
 
 
 @cli.command()
-def demo2():
+@solver_options(DEMO_BATCH_HELP)
+def demo2(**opts):
     """Run with data from the demo2 endpoint."""
-    ciphertext = fetch_demo_data("http://127.0.0.1:8000/api/demo2")
-    plaintext = solver(demo_submit_guess, ciphertext)
-    print(plaintext)
+    _run_demo("/api/demo2", **opts)
 
 
 @cli.command()
-def demo3():
+@solver_options(DEMO_BATCH_HELP)
+def demo3(**opts):
     """Run with data from the demo3 endpoint."""
-    ciphertext = fetch_demo_data("http://127.0.0.1:8000/api/demo3")
-    plaintext = solver(demo_submit_guess, ciphertext)
-    print(plaintext)
+    _run_demo("/api/demo3", **opts)
 
 
 @cli.command()
@@ -87,11 +183,37 @@ def demo3():
     default="b64",
 )
 @click.option("--guess-fn", "-g", required=True, type=click.Path(exists=True))
-def solve(ciphertext_path: str, ciphertext_format: CiphertextFormat, guess_fn: str):
+@solver_options(
+    f"Send guesses in batches through `{PLUGIN_BATCH_FUNC_NAME}` (replaces --workers)"
+)
+def solve(
+    ciphertext_path: str,
+    ciphertext_format: CiphertextFormat,
+    guess_fn: str,
+    workers: int,
+    rate_limit: float,
+    block_workers: int,
+    ascii_bias: bool,
+    batch: bool,
+):
     """Solve a given ciphertext with a user defined guess function."""
     ciphertext = load_ciphertext(ciphertext_path, ciphertext_format)
-    submit_guess_fn = load_guess_fn(guess_fn)
-    plaintext = solver(submit_guess_fn, ciphertext)
+    submit_guess_fn, submit_guess_batch_fn = load_guess_fns(guess_fn)
+    if not batch:
+        submit_guess_batch_fn = None
+    elif submit_guess_batch_fn is None:
+        raise click.UsageError(
+            f"--batch needs the guess module to define `{PLUGIN_BATCH_FUNC_NAME}`"
+        )
+    plaintext = solver(
+        submit_guess_fn,
+        ciphertext,
+        workers,
+        rate_limit,
+        block_workers,
+        ascii_bias,
+        submit_guess_batch_fn,
+    )
     plaintext_path = f"{ciphertext_path}.plaintext"
 
     with open(plaintext_path, "wb") as f:
@@ -102,7 +224,14 @@ def solve(ciphertext_path: str, ciphertext_format: CiphertextFormat, guess_fn: s
 @click.option("--host", default="127.0.0.1", help="Host to bind the server to")
 @click.option("--port", default=8000, help="Port to bind the server to")
 @click.option("--reload", is_flag=True, help="Enable auto-reload for development")
-def demo_api(host: str, port: int, reload: bool):
+@click.option(
+    "--workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of server worker processes",
+)
+@click.option("--access-log", is_flag=True, help="Log every request (slower)")
+def demo_api(host: str, port: int, reload: bool, workers: int, access_log: bool):
     """Start the demo API server for testing padding oracle attacks."""
     try:
         import uvicorn
@@ -119,14 +248,32 @@ def demo_api(host: str, port: int, reload: bool):
     click.echo("  - GET  /api/demo3  - Long text demo")
     click.echo("  - POST /api/encrypt - Encrypt plaintext")
     click.echo("  - POST /api/validate - Validate ciphertext (padding oracle)")
+    click.echo("  - POST /api/validate_batch - Validate many ciphertexts at once")
     click.echo("\nPress Ctrl+C to stop the server")
 
+    # uvicorn's default "auto" loop and HTTP parser pick uvloop and httptools
+    # when they are installed (they come with fastapi[standard]).
     if reload:
         # Use import string for reload mode
-        uvicorn.run("demo_api.api:app", host=host, port=port, reload=True)
+        uvicorn.run(
+            "demo_api.api:app",
+            host=host,
+            port=port,
+            reload=True,
+            access_log=access_log,
+        )
+    elif workers > 1:
+        # Use import string so each worker process can load the app
+        uvicorn.run(
+            "demo_api.api:app",
+            host=host,
+            port=port,
+            workers=workers,
+            access_log=access_log,
+        )
     else:
-        # Use app object for non-reload mode (faster startup)
-        uvicorn.run(app, host=host, port=port, reload=False)
+        # Use app object for single process mode (faster startup)
+        uvicorn.run(app, host=host, port=port, reload=False, access_log=access_log)
 
 
 if __name__ == "__main__":
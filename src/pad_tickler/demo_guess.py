@@ -1,20 +1,95 @@
-import base64
+import binascii
+import functools
+
 import requests
-import time
+from requests.adapters import HTTPAdapter
+
+from pad_tickler.utils import BatchUnsupportedError
+
+# Reuse keep-alive connections across guesses, sized for concurrent workers. A
+# failed guess is reported as False, so never retry it behind the solver's back.
+SESSION = requests.Session()
+SESSION.mount(
+    "http://", HTTPAdapter(pool_connections=1, pool_maxsize=64, max_retries=0)
+)
+
+_VALIDATE_URL = "http://127.0.0.1:8000/api/validate"
+_VALIDATE_BATCH_URL = "http://127.0.0.1:8000/api/validate_batch"
+
+# Only the base64 ciphertext changes between guesses, so build the JSON bodies
+# from fixed byte strings instead of serializing a dict per request. Base64
+# text never needs escaping inside a JSON string.
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_VALIDATE_BODY_HEAD = b'{"alg":"AES-128-CBC","ciphertext_b64":"'
+_VALIDATE_BODY_TAIL = b'"}'
+_VALIDATE_BATCH_BODY_HEAD = b'{"alg":"AES-128-CBC","ciphertexts_b64":["'
+_VALIDATE_BATCH_BODY_SEP = b'","'
+_VALIDATE_BATCH_BODY_TAIL = b'"]}'
+
+
+def _b64(data: bytes) -> bytes:
+    """Standard base64 as bytes, without the trailing newline."""
+    return binascii.b2a_base64(data, newline=False)
+
+
+@functools.lru_cache(maxsize=8)
+def _b64_target_tail(target_tail: bytes) -> bytes:
+    """Base64 of the target bytes after the first 3-byte boundary of prev+target."""
+    return _b64(target_tail)
 
 
 def submit_guess(prev_block: bytes, target_block: bytes) -> bool:
     """Submit a padding guess to the oracle (demo API) to validate the given ciphertext."""
-    ciphertext = prev_block + target_block
-    ciphertext_b64 = base64.b64encode(ciphertext).decode("utf-8")
-
-    payload = {"alg": "AES-128-CBC", "ciphertext_b64": ciphertext_b64}
+    # Base64 works in 3-byte groups, so split prev+target on a group boundary and
+    # reuse the encoding of the target's tail, which stays fixed for a whole block.
+    split = -len(prev_block) % 3
+    body = b"".join(
+        (
+            _VALIDATE_BODY_HEAD,
+            _b64(prev_block + target_block[:split]),
+            _b64_target_tail(target_block[split:]),
+            _VALIDATE_BODY_TAIL,
+        )
+    )
 
     try:
-        url = "http://127.0.0.1:8000/api/validate"
-        response = requests.post(url, json=payload, timeout=10)
-        time.sleep(0.01)  # Small delay to prevent overwhelming the server
+        response = SESSION.post(
+            _VALIDATE_URL, data=body, headers=_JSON_HEADERS, timeout=10
+        )
         return response.status_code == 200
     except Exception as e:
         print(f"Request failed: {e}")
         return False
+
+
+def submit_guess_batch(prev_blocks: list[bytes], target_block: bytes) -> list[bool]:
+    """Submit several padding guesses for one target block in a single request.
+    Raises BatchUnsupportedError if the demo API has no batch endpoint.
+    """
+    split = -len(prev_blocks[0]) % 3
+    tail_b64 = _b64_target_tail(target_block[split:])
+    target_head = target_block[:split]
+    body = b"".join(
+        (
+            _VALIDATE_BATCH_BODY_HEAD,
+            _VALIDATE_BATCH_BODY_SEP.join(
+                _b64(prev_block + target_head) + tail_b64 for prev_block in prev_blocks
+            ),
+            _VALIDATE_BATCH_BODY_TAIL,
+        )
+    )
+
+    try:
+        response = SESSION.post(
+            _VALIDATE_BATCH_URL, data=body, headers=_JSON_HEADERS, timeout=10
+        )
+        if response.status_code == 404:
+            # An older demo API; the solver falls back to single guesses.
+            raise BatchUnsupportedError(f"{_VALIDATE_BATCH_URL} not found")
+        response.raise_for_status()
+        return response.json()["valid"]
+    except BatchUnsupportedError:
+        raise
+    except Exception as e:
+        print(f"Request failed: {e}")
+        return [False] * len(prev_blocks)
@@ -1,14 +1,46 @@
-from typing import Tuple
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from itertools import count, repeat
+import threading
+import time
+from typing import Optional, Tuple
 
 from pad_tickler.state_snapshot import StateSnapshot
 from pad_tickler.state_queue import SingleSlotQueue
-from pad_tickler.utils import SubmitGuessFn
-
-MAX_POSSIBLE_STEPS = 0
-CURRENT_STEP = 0
-BYTES_FOUND = 0
-BYTES_TOTAL = 0
-COMPLETION_PERCENT = 0.00
+from pad_tickler.utils import (
+    BatchUnsupportedError,
+    SubmitGuessBatchFn,
+    SubmitGuessFn,
+    xor_bytes,
+)
+
+# Snapshots are built at most this often, except on hits and block boundaries.
+PUBLISH_PER_SECOND = 30
+
+# Single-byte strings for every guess value, e.g. _BYTE_VALUES[0x41] == b"A".
+_BYTE_VALUES = tuple(bytes([g]) for g in range(256))
+
+# Plaintext byte values in rough order of likelihood for English text, then PKCS#7
+# padding values, then everything else; a full permutation of 0..255.
+_ASCII_BIAS_ORDER = tuple(
+    dict.fromkeys(
+        b" etaoinsrhldcumfpgwybvkxjqz"
+        b"ETAOINSRHLDCUMFPGWYBVKXJQZ"
+        b".,'\"-!?:;\n0123456789()/&"
+        + bytes(range(1, 17))
+        + bytes(range(32, 127))
+        + bytes(range(256))
+    )
+)
+
+# Guesses per call when the oracle accepts batches (submit_batch).
+BATCH_GUESSES = 64
+
+# With ascii_bias, re-sort the guess order by recovered byte counts this often.
+_REORDER_EVERY = 16
+
+# Moving the k-1 solved tail bytes from decrypting to k-1 to decrypting to k is
+# one XOR by (k-1)^k, e.g. _TAIL_DELTAS[3] == b"\x01\x01" (0x02 -> 0x03).
+_TAIL_DELTAS = (b"",) + tuple(bytes([(k - 1) ^ k]) * (k - 1) for k in range(1, 256))
 
 
 def confirm_guess(
@@ -25,9 +57,13 @@ def confirm_guess(
         # Accept as confirmed when no non-tail byte to flip (like at k == block_size).
         return True, -1
 
-    c_prev_prime2 = c_prev_prime[:]
-    c_prev_prime2[flipped_idx] ^= 0x01
-    is_confirmed = submit(bytes(c_prev_prime2), c_target_block)
+    # Flip in place and restore afterwards rather than copying the block. Each
+    # block's C'(n-1) is only touched by the thread solving that block.
+    c_prev_prime[flipped_idx] ^= 0x01
+    try:
+        is_confirmed = submit(bytes(c_prev_prime), c_target_block)
+    finally:
+        c_prev_prime[flipped_idx] ^= 0x01
     return is_confirmed, flipped_idx
 
 
@@ -37,21 +73,36 @@ def solve_message(
     ciphertext: bytes,
     *,
     block_size: int = 16,
+    workers: int = 1,
+    block_workers: int = 1,
+    ascii_bias: bool = False,
+    submit_batch: Optional[SubmitGuessBatchFn] = None,
+    fast_confirm: bool = True,
 ):
     """
     Solve all blocks of a CBC-encrypted message via a padding oracle.
     - iv: 16-byte IV (AES)
     - ciphertext: N*16 bytes
-    Returns plaintext, intermediates per block, and per-block stats.
+    - workers: guesses submitted concurrently (submit must be thread-safe if > 1)
+    - block_workers: blocks solved concurrently (submit must be thread-safe if > 1)
+    - ascii_bias: guess bytes that decrypt to common English text first
+    - submit_batch: optional oracle taking many guesses per call; replaces workers
+      until it raises BatchUnsupportedError
+    - fast_confirm: only confirm hits at k==1; False confirms every hit
+    Returns the plaintext bytes (still padded), or None if solving failed.
+    Raises ValueError if workers or block_workers is less than 1.
     """
-    global \
-        MAX_POSSIBLE_STEPS, \
-        CURRENT_STEP, \
-        BYTES_FOUND, \
-        BYTES_TOTAL, \
-        COMPLETION_PERCENT
+    if workers < 1 or block_workers < 1:
+        raise ValueError("workers and block_workers must be at least 1")
 
     plaintext_result = None
+    # Overlap oracle round trips by submitting batches of guesses from a pool.
+    # The pool also stands by for batching, in case the batch oracle turns out to
+    # be unsupported; its threads are only started on first use.
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    block_executor = (
+        ThreadPoolExecutor(max_workers=block_workers) if block_workers > 1 else None
+    )
 
     try:
         assert len(ciphertext) % block_size == 0, "ciphertext must be block-aligned"
@@ -63,24 +114,76 @@ def solve_message(
         ]
         block_count = len(ciphertext_blocks)
 
-        # Initialize other sets of blocks.
+        # Initialize other sets of blocks. The intermediate and plaintext bytes are
+        # kept flat, with `solved` marking which of them are known, so a snapshot
+        # copies each with a single bytes() call.
         ciphertext_prime_blocks = [bytearray(block) for block in ciphertext_blocks]
-        intermediate_blocks = [
-            [None for _ in range(block_size)] for _ in range(block_count)
-        ]
-        plaintext_blocks = [
-            [None for _ in range(block_size)] for _ in range(block_count)
-        ]
+        intermediate = bytearray(len(ciphertext))
+        plaintext = bytearray(len(ciphertext))
+        solved = bytearray(len(ciphertext))
+
+        # Progress counters, shared by the block workers and carried on snapshots.
+        bytes_total = len(ciphertext) - block_size  # Don't count IV bytes
+        max_possible_steps = 256 * bytes_total
+        bytes_found = 0
+        current_step = 0
+        stats_lock = threading.Lock()
+        state_versions = count(1)  # next() is atomic, so blocks can share it.
+        abort = threading.Event()
+        last_publish = 0.0
+
+        # With ascii_bias, plaintext bytes are guessed in this order, re-sorted as
+        # bytes are recovered so the message's own frequent bytes come first.
+        guess_order = _ASCII_BIAS_ORDER
+        plaintext_counts = [0] * 256
+
+        def publish(
+            block_index_n: int,
+            byte_index_i: int,
+            byte_value_g: int,
+            pad_length_k: int,
+            *,
+            complete: bool = False,
+            force: bool = False,
+        ) -> None:
+            """Publish a state snapshot, throttled to the UI frame rate unless forced.
+            Unforced snapshots are also skipped while the last one is still unread.
+            """
+            nonlocal last_publish
+            now = time.monotonic()
+            if not force and (
+                now - last_publish < 1 / PUBLISH_PER_SECOND
+                or not state_queue.needs_update()
+            ):
+                return
+            last_publish = now
+            state_queue.publish(
+                StateSnapshot(
+                    state_version=next(state_versions),
+                    complete=complete,
+                    block_count=block_count - 1,  # Don't count IV as a block to decrypt
+                    block_size=block_size,
+                    block_index_n=block_index_n,
+                    byte_index_i=byte_index_i,
+                    byte_value_g=byte_value_g,
+                    pad_length_k=pad_length_k,
+                    current_step=current_step,
+                    max_possible_steps=max_possible_steps,
+                    bytes_found=bytes_found,
+                    bytes_total=bytes_total,
+                    ciphertext=ciphertext,
+                    ciphertext_prime=b"".join(ciphertext_prime_blocks),
+                    intermediate=bytes(intermediate),
+                    plaintext=bytes(plaintext),
+                    solved=bytes(solved),
+                )
+            )
 
-        BYTES_TOTAL = len(ciphertext) - block_size  # Don't count IV bytes
-        MAX_POSSIBLE_STEPS = 256 * block_size * (block_count - 1)  # Don't count IV
-        BYTES_FOUND = 0
-        CURRENT_STEP = 0
-        state_version = 0
+        def solve_block(block_index_n: int) -> None:
+            """Solve one ciphertext block. Blocks only share the counters and queue."""
+            nonlocal current_step, bytes_found, guess_order, submit_batch
 
-        # Solve each individual block
-        # Skip the first block (IV) and only decrypt actual ciphertext blocks
-        for block_index_n, ciphertext_n in enumerate(ciphertext_blocks[1:], start=1):
+            ciphertext_n = ciphertext_blocks[block_index_n]
             skip_trivial_original = True
 
             # The previous block for decryption (IV for first block, previous ciphertext for others)
@@ -90,9 +193,6 @@ def solve_message(
                 and len(ciphertext_n) == block_size
             )
 
-            # Storage for intermediate bytes I_i (fill right->left)
-            intermediate_n = intermediate_blocks[block_index_n]
-
             # Create a new snapshot of the state.
             intermediate_i = (
                 block_size - 1
@@ -100,125 +200,166 @@ def solve_message(
             byte_value_g = 0  # Start with byte value 0.
             pad_length_k = 1  # Start with padding length 1.
 
-            state_version += 1
-            snapshot = StateSnapshot(
-                state_version=state_version,
-                complete=False,
-                block_count=block_count - 1,  # Don't count IV as a block to decrypt
-                block_size=block_size,
-                block_index_n=block_index_n,  # Already 1-based from enumerate start=1
-                byte_index_i=intermediate_i,
-                byte_value_g=byte_value_g,
-                pad_length_k=pad_length_k,
-                ciphertext=tuple(tuple(block) for block in ciphertext_blocks),
-                ciphertext_prime=tuple(
-                    tuple(block) for block in ciphertext_prime_blocks
-                ),
-                intermediate=intermediate_blocks,
-                plaintext=plaintext_blocks,
+            publish(
+                block_index_n, intermediate_i, byte_value_g, pad_length_k, force=True
             )
-            state_queue.publish(snapshot)
 
             # Iterate backwards over each byte in the block.
             # Padding length k is the number of bytes from the end of the block.
             for pad_length_k in range(1, block_size + 1):
-                # Fill in the already-solved tail bytes from the intermediate block.
-                for j in range(block_size - (pad_length_k - 1), block_size):
-                    intermediate_i = intermediate_n[j]
-                    if intermediate_i is None:
-                        # Not solved yet (will happen only at start of each k).
-                        continue
-                    ciphertext_prime_n1[j] = intermediate_i ^ pad_length_k
+                if abort.is_set():
+                    return  # Another block failed.
+
+                # Re-program the already-solved tail bytes, which decrypt to k-1 from
+                # the previous step, so they decrypt to the padding value k.
+                tail_start = block_size - (pad_length_k - 1)
+                if tail_start < block_size:
+                    ciphertext_prime_n1[tail_start:] = xor_bytes(
+                        ciphertext_prime_n1[tail_start:], _TAIL_DELTAS[pad_length_k]
+                    )
 
                 # Brute-force the new target byte at i = block_size - k, looking for the value
                 # that produces valid padding and reveals the correct intermediate byte.
                 byte_index_i = block_size - pad_length_k
-                found = False
-                for byte_value_g in range(256):
-                    CURRENT_STEP += 1
 
-                    # Skip trivial original only for k==1
+                # Guess g decrypts to plaintext g ^ k ^ C(n-1)[i].
+                mask = pad_length_k ^ ciphertext_blocks[block_index_n - 1][byte_index_i]
+                if ascii_bias:
+                    # Try the guesses for likely plaintext bytes first.
+                    byte_values = [p ^ mask for p in guess_order]
+                else:
+                    byte_values = list(range(256))
+                # For k==1 try the trivial original last: it just reproduces the real
+                # padding, which is only the answer when the plaintext ends in 0x01.
+                if skip_trivial_original and pad_length_k == 1:
                     original_byte_value = ciphertext_prime_n1[byte_index_i]
-                    if (
-                        skip_trivial_original
-                        and pad_length_k == 1
-                        and byte_value_g == original_byte_value
-                    ):
-                        continue
-
-                    ciphertext_prime_n1[byte_index_i] = byte_value_g
-
-                    state_version += 1
-                    snapshot = StateSnapshot(
-                        state_version=state_version,
-                        complete=False,
-                        block_count=block_count
-                        - 1,  # Don't count IV as a block to decrypt
-                        block_size=block_size,
-                        block_index_n=block_index_n,  # Already 1-based from enumerate start=1
-                        byte_index_i=byte_index_i,
-                        byte_value_g=byte_value_g,
-                        pad_length_k=pad_length_k,
-                        ciphertext=tuple(tuple(block) for block in ciphertext_blocks),
-                        ciphertext_prime=tuple(
-                            tuple(block) for block in ciphertext_prime_blocks
-                        ),
-                        intermediate=intermediate_blocks,
-                        plaintext=plaintext_blocks,
+                    byte_values.remove(original_byte_value)
+                    byte_values.append(original_byte_value)
+                elif pad_length_k > 1:
+                    # Try repeating the byte just recovered first. Padding and runs
+                    # of the same character are then found in one guess.
+                    repeat_byte_value = (
+                        plaintext[block_index_n * block_size + byte_index_i + 1] ^ mask
                     )
-                    state_queue.publish(snapshot)
+                    byte_values.remove(repeat_byte_value)
+                    byte_values.insert(0, repeat_byte_value)
 
-                    # Submit the guess to the oracle.
-                    is_valid_guess = submit(bytes(ciphertext_prime_n1), ciphertext_n)
-                    if not is_valid_guess:
-                        continue
+                # Only the guessed byte changes for this k, so build each candidate
+                # from the fixed bytes around it instead of copying the bytearray.
+                prefix = bytes(ciphertext_prime_n1[:byte_index_i])
+                suffix = bytes(ciphertext_prime_n1[byte_index_i + 1 :])
 
-                    # Confirm guess validity by flipping a non-tail byte.
-                    confirmed, _ = confirm_guess(
-                        submit, ciphertext_prime_n1, ciphertext_n, pad_length_k
-                    )
-                    if confirmed:
-                        # Save the discovered intermediate byte.
-                        intermediate_n[byte_index_i] = byte_value_g ^ pad_length_k
-                        prev_block = ciphertext_blocks[block_index_n - 1]
-
-                        # For CBC mode, plaintext = previous_ciphertext_block XOR intermediate
-                        plaintext_blocks[block_index_n][byte_index_i] = (
-                            prev_block[byte_index_i] ^ intermediate_n[byte_index_i]
-                        )
-
-                        found = True
-                        BYTES_FOUND += 1
-                        COMPLETION_PERCENT = BYTES_FOUND / BYTES_TOTAL * 100
-                        break
-                    else:
+                found = False
+                batch_start = 0
+                while batch_start < len(byte_values):
+                    batch_size = BATCH_GUESSES if submit_batch is not None else workers
+                    batch = byte_values[batch_start : batch_start + batch_size]
+                    batch_start += len(batch)
+                    candidates = [prefix + _BYTE_VALUES[g] + suffix for g in batch]
+                    byte_value_g = batch[-1]
+                    ciphertext_prime_n1[byte_index_i] = byte_value_g
+                    with stats_lock:
+                        current_step += len(batch)
+
+                    publish(block_index_n, byte_index_i, byte_value_g, pad_length_k)
+
+                    # Submit the guesses to the oracle.
+                    results = None
+                    if submit_batch is not None:
+                        try:
+                            results = submit_batch(candidates, ciphertext_n)
+                        except BatchUnsupportedError:
+                            # Fall back to single guesses, for every block from now on.
+                            submit_batch = None
+                    if results is None and executor is None:
+                        # Lazily, so guesses after the first hit are never sent.
+                        results = (submit(c, ciphertext_n) for c in candidates)
+                    elif results is None:
+                        results = executor.map(submit, candidates, repeat(ciphertext_n))
+
+                    # Take the first valid guess in byte order, as a serial scan would.
+                    for byte_value_g, is_valid_guess in zip(batch, results):
+                        if not is_valid_guess:
+                            continue
+
+                        # Confirm guess validity by flipping a non-tail byte. Only k==1
+                        # is ambiguous (e.g. a hit on "02 02"); for k>=2 the programmed
+                        # tail already ends in k-1 bytes of k, so the padding must be k
+                        # unless the oracle is not checking PKCS#7 strictly.
+                        ciphertext_prime_n1[byte_index_i] = byte_value_g
+                        if pad_length_k == 1 or not fast_confirm:
+                            confirmed, _ = confirm_guess(
+                                submit, ciphertext_prime_n1, ciphertext_n, pad_length_k
+                            )
+                        else:
+                            confirmed = True
+                        if confirmed:
+                            # Save the discovered intermediate byte.
+                            offset = block_index_n * block_size + byte_index_i
+                            intermediate[offset] = byte_value_g ^ pad_length_k
+                            prev_block = ciphertext_blocks[block_index_n - 1]
+
+                            # For CBC mode, plaintext = previous_ciphertext_block XOR intermediate
+                            plaintext[offset] = (
+                                prev_block[byte_index_i] ^ intermediate[offset]
+                            )
+                            solved[offset] = 1
+
+                            found = True
+                            with stats_lock:
+                                bytes_found += 1
+                                plaintext_counts[plaintext[offset]] += 1
+                                if ascii_bias and bytes_found % _REORDER_EVERY == 0:
+                                    # Stable sort: ties keep the static English order.
+                                    guess_order = tuple(
+                                        sorted(
+                                            _ASCII_BIAS_ORDER,
+                                            key=lambda p: -plaintext_counts[p],
+                                        )
+                                    )
+                            publish(
+                                block_index_n,
+                                byte_index_i,
+                                byte_value_g,
+                                pad_length_k,
+                                force=True,
+                            )
+                            break
                         # Not confirmed. Likely a false positive.
-                        continue
+
+                    if found:
+                        break
 
                 if not found:
                     raise RuntimeError(
                         f"No valid guess found at k={pad_length_k} (i={byte_index_i}); oracle not behaving like pure PKCS#7?"
                     )
 
+        # Solve each individual block
+        # Skip the first block (IV) and only decrypt actual ciphertext blocks.
+        # Each block only needs its own and the previous original ciphertext block,
+        # so blocks can be solved concurrently.
+        block_indexes = range(1, block_count)
+        if block_executor is None:
+            for block_index_n in block_indexes:
+                solve_block(block_index_n)
+        else:
+            futures = [block_executor.submit(solve_block, n) for n in block_indexes]
+            try:
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            except BaseException:  # e.g. KeyboardInterrupt while waiting.
+                abort.set()
+                raise
+            for future in done:
+                error = future.exception()
+                if error is not None:
+                    abort.set()  # Stop the other blocks at their next byte.
+                    raise error
+
         # Final state snapshot.
-        state_version += 1
-        snapshot = StateSnapshot(
-            state_version=state_version,
-            complete=True,
-            block_count=block_count - 1,
-            block_size=block_size,
-            block_index_n=block_index_n,
-            byte_index_i=byte_index_i,
-            byte_value_g=byte_value_g,
-            pad_length_k=pad_length_k,
-            ciphertext=tuple(tuple(block) for block in ciphertext_blocks),
-            ciphertext_prime=tuple(tuple(block) for block in ciphertext_prime_blocks),
-            intermediate=intermediate_blocks,
-            plaintext=plaintext_blocks,
-        )
-        state_queue.publish(snapshot)
-
-        plaintext_result = plaintext_blocks
+        publish(block_count - 1, 0, 0, block_size, complete=True, force=True)
+
+        plaintext_result = bytes(plaintext[block_size:])  # Don't return the IV
 
     except Exception as e:
         print(f"Error in solve_message: {e}")
@@ -226,6 +367,10 @@ def solve_message(
 
         traceback.print_exc()
     finally:
+        if block_executor is not None:
+            block_executor.shutdown(cancel_futures=True)
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
         # Always close the queue so the UI can exit
         state_queue.close()
 
@@ -1,5 +1,7 @@
+from collections import deque
 from typing import Generic, TypeVar, Optional
 import threading
+import time
 
 
 T = TypeVar("T")
@@ -8,36 +10,43 @@ T = TypeVar("T")
 class SingleSlotQueue(Generic[T]):
     """Thread-safe, size=1, latest-wins queue. Consumers read the latest item."""
 
+    __slots__ = ("_closed", "_event", "_slot")
+
     def __init__(self) -> None:
-        self._condition = threading.Condition()
-        self._has_value = False
-        self._value: Optional[T] = None
+        # deque append/popleft are atomic, so the producer never takes a lock.
+        self._slot: deque[T] = deque(maxlen=1)
+        self._event = threading.Event()
         self._closed = False
 
     def publish(self, item: T) -> None:
         """Publish an item to the queue. Overwrites any stale value."""
-        with self._condition:
-            self._value = item  # Overwrite any stale value.
-            self._has_value = True
-            self._condition.notify()  # Wake exactly one waiting consumer.
+        self._slot.append(item)  # maxlen=1 drops any stale value.
+        self._event.set()  # Wake the waiting consumer.
+
+    def needs_update(self) -> bool:
+        """True if the consumer has taken the last published item, if any."""
+        return not self._slot
 
     def close(self) -> None:
         """Close the queue. No more items will be published."""
-        with self._condition:
-            self._closed = True
-            self._condition.notify_all()
+        self._closed = True
+        self._event.set()
 
     def get(self, timeout: Optional[float] = None) -> Optional[T]:
         """Blocks until a value is available or the queue is closed. Returns None on close."""
-        with self._condition:
-            ok = self._condition.wait_for(
-                lambda: self._has_value or self._closed, timeout
-            )
-            if not ok:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Check the slot after every wake-up; a publish racing the clear()
+            # below is either seen here or sets the event again.
+            try:
+                return self._slot.popleft()
+            except IndexError:
+                pass
+            if self._closed:
+                # Drain an item published just before close().
+                return self._slot.popleft() if self._slot else None
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if not self._event.wait(remaining):
                 raise TimeoutError("queue get() timed out")
-            if self._closed and not self._has_value:
-                return None
-            v = self._value
-            self._value = None
-            self._has_value = False
-            return v
+            self._event.clear()
@@ -1,10 +1,13 @@
-from dataclasses import dataclass, field
-from typing import Tuple
+from dataclasses import dataclass
 
 
 @dataclass(frozen=True, slots=True)
 class StateSnapshot:
-    """Minimal immutable snapshot of solver state."""
+    """Minimal immutable snapshot of solver state.
+
+    Byte fields are flat across all blocks, IV first. `solved` is 1 for each
+    intermediate/plaintext byte that has been found and 0 otherwise.
+    """
 
     state_version: int
     complete: bool
@@ -15,7 +18,23 @@ class StateSnapshot:
     byte_value_g: int
     pad_length_k: int
 
-    ciphertext: Tuple[bytes | None, ...] = field(default_factory=tuple)
-    ciphertext_prime: Tuple[bytes | None, ...] = field(default_factory=tuple)
-    intermediate: Tuple[bytes | None, ...] = field(default_factory=tuple)
-    plaintext: Tuple[bytes | None, ...] = field(default_factory=tuple)
+    current_step: int = 0
+    max_possible_steps: int = 0
+    bytes_found: int = 0
+    bytes_total: int = 0
+
+    ciphertext: bytes = b""
+    ciphertext_prime: bytes = b""
+    intermediate: bytes = b""
+    plaintext: bytes = b""
+    solved: bytes = b""
+
+    @property
+    def completion_percent(self) -> float:
+        """Percentage of the message's bytes (not counting the IV) solved so far."""
+        return self.bytes_found / self.bytes_total * 100 if self.bytes_total else 0.0
+
+    def block(self, data: bytes, block_index: int) -> bytes:
+        """Slice one block out of a flat byte field of this snapshot."""
+        start = block_index * self.block_size
+        return data[start : start + self.block_size]
@@ -1,3 +1,5 @@
+import functools
+import time
 from typing import Optional, Literal
 from rich.panel import Panel
 from rich.table import Table
@@ -23,43 +25,69 @@ COLORS = {
     },
 }
 
+# Render at most this often; the queue coalesces snapshots published in between.
+REFRESH_PER_SECOND = 30
+
+# Styled "xx" hex cells for every byte value, plus "??" at index 256 for unknown
+# bytes, so the per-byte current block is rendered with table lookups.
+_UNKNOWN_BYTE = 256
+_STYLED_HEX = {
+    style: tuple(f"[{style}]{v:02x}[/{style}]" for v in range(256))
+    + (f"[{style}]??[/{style}]",)
+    for style in {
+        COLORS["current_byte"],
+        *(
+            color
+            for block_type in COLORS.values()
+            if isinstance(block_type, dict)
+            for color in block_type.values()
+        ),
+    }
+}
+
 type BlockType = Literal["ciphertext", "intermediate", "plaintext"]
 type BlockState = Literal["unsolved", "solved", "current", "previous", "other"]
 
 
+# Cached: most blocks are unchanged between frames (all hashable args).
+@functools.lru_cache(maxsize=1024)
 def block_to_string(
-    block: tuple,
+    block: bytes,
     block_type: BlockType,
     block_state: BlockState,
     current_byte_index: int = -1,
+    solved: Optional[bytes] = None,
 ) -> str:
-    """Convert a block to hex string and apply coloring."""
-    result = ""
-
-    normalized_block = ["??" if b is None else f"{b:02x}" for b in block]
-
+    """Convert a block to hex string and apply coloring.
+    Bytes whose `solved` flag is 0 are shown as "??".
+    """
     if block_state == "current":
+        unsolved_cells = _STYLED_HEX[COLORS[block_type]["unsolved"]]
+        current_cells = _STYLED_HEX[COLORS["current_byte"]]
+        solved_cells = _STYLED_HEX[COLORS[block_type]["solved"]]
         hex_bytes = []
-        for i, b in enumerate(normalized_block):
+        for i, b in enumerate(block):
             if i < current_byte_index:
-                b = f"[{COLORS[block_type]['unsolved']}]{b}[/{COLORS[block_type]['unsolved']}]"
-            if i > current_byte_index:
-                b = f"[{COLORS[block_type]['solved']}]{b}[/{COLORS[block_type]['solved']}]"
+                cells = unsolved_cells
+            elif i > current_byte_index:
+                cells = solved_cells
             else:
-                b = f"[{COLORS['current_byte']}]{b}[/{COLORS['current_byte']}]"
-            hex_bytes.append(b)
-
-        result = " ".join(hex_bytes)
-    elif block_state == "solved":
-        result = " ".join(
-            f"[{COLORS[block_type]['solved']}]{hex_val}[/{COLORS[block_type]['solved']}]"
-            for hex_val in normalized_block
-        )
-    elif block_state == "unsolved":
-        result = " ".join(
-            f"[{COLORS[block_type]['unsolved']}]{hex_val}[/{COLORS[block_type]['unsolved']}]"
-            for hex_val in normalized_block
+                cells = current_cells
+            hex_bytes.append(cells[b if solved is None or solved[i] else _UNKNOWN_BYTE])
+
+        return " ".join(hex_bytes)
+
+    if solved is None or 0 not in solved:
+        hex_text = block.hex(" ")  # Fully known: format in one C call.
+    else:
+        hex_text = " ".join(
+            f"{b:02x}" if solved[i] else "??" for i, b in enumerate(block)
         )
+
+    if block_state in ("solved", "unsolved"):
+        # One style tag around the whole block instead of one per byte.
+        color = COLORS[block_type][block_state]
+        result = f"[{color}]{hex_text}[/{color}]"
     else:
         raise ValueError(f"Invalid block state: {block_state}")
 
@@ -73,8 +101,11 @@ def render(state: Optional[StateSnapshot]):
             "Waiting for first update…", title="Padding Oracle", border_style="dim"
         )
 
-    if len(state.ciphertext) != len(state.intermediate) or len(state.ciphertext) != len(
-        state.plaintext
+    if not (
+        len(state.ciphertext)
+        == len(state.intermediate)
+        == len(state.plaintext)
+        == len(state.solved)
     ):
         raise ValueError(
             "Ciphertext, intermediate, and plaintext must have the same number of blocks"
@@ -82,19 +113,20 @@ def render(state: Optional[StateSnapshot]):
 
     # Create the UI table.
     ui_table = Table(
-        title=f"Block {state.block_index_n} / {state.block_count}  |  Byte {state.byte_index_i + 1}  |  v{state.state_version}"
+        title=f"Block {state.block_index_n} / {state.block_count}  |  Byte {state.byte_index_i + 1}  |  {state.bytes_found} / {state.bytes_total} bytes ({state.completion_percent:.1f}%)  |  v{state.state_version}"
     )
     ui_table.add_column("Block", justify="right")
     ui_table.add_column("Ciphertext Prime Cₙ₋₁′")
     ui_table.add_column("Intermediate Iₙ")
     ui_table.add_column("Plaintext Pₙ")
 
-    block_count = len(state.ciphertext)
+    block_count = len(state.ciphertext) // state.block_size
     for block_idx in range(block_count):
         # Get the blocks from the state snapshot.
-        ciphertext_prime_block = state.ciphertext_prime[block_idx]
-        intermediate_block = state.intermediate[block_idx]
-        plaintext_block = state.plaintext[block_idx]
+        ciphertext_prime_block = state.block(state.ciphertext_prime, block_idx)
+        intermediate_block = state.block(state.intermediate, block_idx)
+        plaintext_block = state.block(state.plaintext, block_idx)
+        solved = state.block(state.solved, block_idx)
 
         current_byte_index = state.byte_index_i
 
@@ -105,19 +137,25 @@ def render(state: Optional[StateSnapshot]):
                 ciphertext_prime_block, "ciphertext", "current", current_byte_index
             )
             intermediate_string = block_to_string(
-                intermediate_block, "intermediate", "solved"
+                intermediate_block, "intermediate", "solved", solved=solved
+            )
+            plaintext_string = block_to_string(
+                plaintext_block, "plaintext", "solved", solved=solved
             )
-            plaintext_string = block_to_string(plaintext_block, "plaintext", "solved")
         elif block_idx == state.block_index_n and not state.complete:
             # Current block being worked on
             ciphertext_prime_string = block_to_string(
                 ciphertext_prime_block, "ciphertext", "unsolved"
             )
             intermediate_string = block_to_string(
-                intermediate_block, "intermediate", "current", current_byte_index
+                intermediate_block,
+                "intermediate",
+                "current",
+                current_byte_index,
+                solved,
             )
             plaintext_string = block_to_string(
-                plaintext_block, "plaintext", "current", current_byte_index
+                plaintext_block, "plaintext", "current", current_byte_index, solved
             )
         elif block_idx < state.block_index_n and not state.complete:
             # Previous blocks
@@ -125,18 +163,22 @@ def render(state: Optional[StateSnapshot]):
                 ciphertext_prime_block, "ciphertext", "solved"
             )
             intermediate_string = block_to_string(
-                intermediate_block, "intermediate", "solved"
+                intermediate_block, "intermediate", "solved", solved=solved
+            )
+            plaintext_string = block_to_string(
+                plaintext_block, "plaintext", "solved", solved=solved
             )
-            plaintext_string = block_to_string(plaintext_block, "plaintext", "solved")
         else:
             # Other blocks after the current block being worked on
             ciphertext_prime_string = block_to_string(
                 ciphertext_prime_block, "ciphertext", "unsolved"
             )
             intermediate_string = block_to_string(
-                intermediate_block, "intermediate", "unsolved"
+                intermediate_block, "intermediate", "unsolved", solved=solved
+            )
+            plaintext_string = block_to_string(
+                plaintext_block, "plaintext", "unsolved", solved=solved
             )
-            plaintext_string = block_to_string(plaintext_block, "plaintext", "unsolved")
 
         # Add the blocks to the UI table.
         block_idx_string = str(block_idx)
@@ -155,10 +197,22 @@ def render(state: Optional[StateSnapshot]):
 
 
 def ui_loop(state_queue: SingleSlotQueue[StateSnapshot]) -> None:
-    """Loop the UI."""
-    with Live(render(None), refresh_per_second=30, screen=False) as live:
+    """Loop the UI, rendering only the latest snapshot once per frame."""
+    frame_interval = 1 / REFRESH_PER_SECOND
+    with Live(
+        render(None), refresh_per_second=REFRESH_PER_SECOND, screen=False
+    ) as live:
+        next_frame = time.monotonic()
         while True:
             state = state_queue.get()
             if state is None:
                 break
             live.update(render(state))
+
+            # Wait out the rest of the frame so the solver never waits on redraws.
+            next_frame += frame_interval
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_frame = time.monotonic()
@@ -1,12 +1,16 @@
 import base64
 import importlib.util
 import inspect
+import threading
+import time
 import types
-from typing import Callable, Union, Literal, List
+from typing import Callable, Optional, Union, Literal
 
 SubmitGuessFn = Callable[[bytes, bytes], bool]
+SubmitGuessBatchFn = Callable[[list[bytes], bytes], list[bool]]
 
 PLUGIN_FUNC_NAME = "submit_guess"
+PLUGIN_BATCH_FUNC_NAME = "submit_guess_batch"
 
 type CiphertextFormat = Union[Literal["b64", "b64_urlsafe", "hex", "raw"], str]
 
@@ -19,6 +23,12 @@ class PluginSignatureError(TypeError):
     pass
 
 
+class BatchUnsupportedError(RuntimeError):
+    """Raised by a batch guess function when the target can't take batches.
+    The solver then falls back to single guesses over its worker pool.
+    """
+
+
 def load_module_from_file(module_file_path: str) -> types.ModuleType:
     """Load a Python module file."""
     spec = importlib.util.spec_from_file_location("guess_fn", module_file_path)
@@ -29,15 +39,8 @@ def load_module_from_file(module_file_path: str) -> types.ModuleType:
     return mod
 
 
-def load_guess_fn(module_file_path: str) -> Callable[[bytes, bytes], bool]:
-    """Load the user defined guess function from a Python module file."""
-    mod = load_module_from_file(module_file_path)
-    fn = getattr(mod, PLUGIN_FUNC_NAME, None)
-    if fn is None:
-        raise PluginLoadError(
-            f"Plugin must define `{PLUGIN_FUNC_NAME}(prev_block: bytes, target_block: bytes) -> bool`"
-        )
-
+def _check_positional_args(fn: Callable, name: str, args: str) -> None:
+    """Raise PluginSignatureError unless fn takes exactly two positional args."""
     sig = inspect.signature(fn)
     params = list(sig.parameters.values())
     if len(params) != 2 or any(
@@ -49,9 +52,63 @@ def load_guess_fn(module_file_path: str) -> Callable[[bytes, bytes], bool]:
         for p in params
     ):
         raise PluginSignatureError(
-            "submit_guess must accept exactly two positional args: (prev_block: bytes, target_block: bytes)"
+            f"{name} must accept exactly two positional args: {args}"
+        )
+
+
+def load_guess_fns(
+    module_file_path: str,
+) -> tuple[SubmitGuessFn, Optional[SubmitGuessBatchFn]]:
+    """Load the user defined guess function, and its optional batch variant."""
+    mod = load_module_from_file(module_file_path)
+    fn = getattr(mod, PLUGIN_FUNC_NAME, None)
+    if fn is None:
+        raise PluginLoadError(
+            f"Plugin must define `{PLUGIN_FUNC_NAME}(prev_block: bytes, target_block: bytes) -> bool`"
+        )
+    _check_positional_args(
+        fn, PLUGIN_FUNC_NAME, "(prev_block: bytes, target_block: bytes)"
+    )
+
+    batch_fn = getattr(mod, PLUGIN_BATCH_FUNC_NAME, None)
+    if batch_fn is not None:
+        _check_positional_args(
+            batch_fn,
+            PLUGIN_BATCH_FUNC_NAME,
+            "(prev_blocks: list[bytes], target_block: bytes)",
         )
-    return fn
+    return fn, batch_fn
+
+
+def load_guess_fn(module_file_path: str) -> Callable[[bytes, bytes], bool]:
+    """Load the user defined guess function from a Python module file."""
+    return load_guess_fns(module_file_path)[0]
+
+
+def rate_limit_guess_fn(
+    fn: SubmitGuessFn, per_second: float, burst: int = 1
+) -> SubmitGuessFn:
+    """Wrap a guess function in a token bucket: `per_second` guesses a second on
+    average, with up to `burst` sent back to back (e.g. one per worker).
+    """
+    lock = threading.Lock()
+    tokens = float(burst)
+    last_refill = time.monotonic()
+
+    def submit_guess(prev_block: bytes, target_block: bytes) -> bool:
+        nonlocal tokens, last_refill
+        # Take a token under the lock, then sleep outside it. Going negative
+        # reserves a future token, so concurrent callers queue up in order.
+        with lock:
+            now = time.monotonic()
+            tokens = min(burst, tokens + (now - last_refill) * per_second) - 1
+            last_refill = now
+            delay = -tokens / per_second
+        if delay > 0:
+            time.sleep(delay)
+        return fn(prev_block, target_block)
+
+    return submit_guess
 
 
 def load_ciphertext(file_path: str, format: CiphertextFormat) -> bytes:
@@ -84,15 +141,9 @@ def _as_bytes(
         return data.encode(encoding)
 
 
-def bytestring_from_list_of_blocks(blocks: List[List[bytes]]) -> bytes:
-    # Convert list of lists to bytes
-    if blocks:
-        all_bytes = []
-        for byte_list in blocks:
-            if byte_list is not None:  # Skip None blocks (like IV)
-                all_bytes.extend([b for b in byte_list if b is not None])
-        blocks_bytes = bytes(all_bytes)
-        return blocks_bytes
+def xor_bytes(a: bytes, b: bytes) -> bytes:
+    """XOR two equal-length byte strings as integers, in one C-level operation."""
+    return (int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).to_bytes(len(a), "big")
 
 
 def strip_plaintext_padding(plaintext: bytes) -> bytes: